@@ -5,11 +5,40 @@ try:
 except Exception:
     pass
 
+import copy
+import hashlib
 import json
 import os
 import logging
+import threading
+import time
 import unicodedata
-from openai import OpenAI
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Literal
+import httpx
+from openai import DefaultHttpxClient, LengthFinishReasonError, OpenAI
+from pydantic import BaseModel, Field
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 support in httpx)
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+# Faster JSON decoding for the batch output file, one line per symbol; live
+# responses are parsed by the SDK's structured outputs instead
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 # Configure Unicode-safe logging
 logger = logging.getLogger(__name__)
@@ -18,43 +47,408 @@ handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
 logger.addHandler(handler)
 logger.setLevel(logging.INFO)
 
+# Common Unicode punctuation and their ASCII equivalents
+_PUNCT_TABLE = str.maketrans({
+    '\u2014': '-',  # em dash
+    '\u2013': '-',  # en dash
+    '\u2018': "'",  # left single quote
+    '\u2019': "'",  # right single quote
+    '\u201C': '"',  # left double quote
+    '\u201D': '"',  # right double quote
+    '\u00A0': ' ',  # non-breaking space
+})
+_ELLIPSIS = '\u2026'
+
 def sanitize_text(s):
     """Convert Unicode text to ASCII-safe text"""
     if not s:
         return ""
     
-    # Normalize Unicode
-    s = unicodedata.normalize('NFKC', str(s))
+    # ASCII text is already safe, so skip normalization entirely
+    if isinstance(s, str) and s.isascii():
+        return s
     
-    # Replace common Unicode punctuation with ASCII equivalents
-    replacements = {
-        '\u2014': '-',  # em dash
-        '\u2013': '-',  # en dash
-        '\u2018': "'",  # left single quote
-        '\u2019': "'",  # right single quote
-        '\u201C': '"',  # left double quote
-        '\u201D': '"',  # right double quote
-        '\u2026': '...',  # ellipsis
-        '\u00A0': ' ',  # non-breaking space
-    }
-    
-    for unicode_char, ascii_char in replacements.items():
-        s = s.replace(unicode_char, ascii_char)
+    # Normalize Unicode and replace common punctuation in a single pass
+    s = unicodedata.normalize('NFKC', str(s)).translate(_PUNCT_TABLE)
+    s = s.replace(_ELLIPSIS, '...')
     
     # Final guard: encode as ASCII with backslash replacement
     return s.encode('ascii', 'backslashreplace').decode('ascii')
 
 def safe_log(msg):
     """Log messages safely without Unicode errors"""
+    # Skip sanitizing entirely when INFO messages would be dropped anyway
+    if not logger.isEnabledFor(logging.INFO):
+        return
     try:
+        if isinstance(msg, str) and msg.isascii():
+            logger.info(msg)
+            return
         sanitized_msg = sanitize_text(msg)
         logger.info(sanitized_msg)
     except UnicodeEncodeError:
         logger.info(str(msg).encode('ascii', 'backslashreplace').decode('ascii'))
 
+# OpenAI response cache. Uses diskcache when installed so results survive restarts,
+# otherwise falls back to a per-process LRU dict of at most MEMORY_CACHE_MAX_ENTRIES.
+CACHE_DIR = ".ai_cache"
+CACHE_TTL_SECONDS = 24 * 60 * 60
+MEMORY_CACHE_MAX_ENTRIES = 256
+_memory_cache = OrderedDict()
+_memory_cache_lock = threading.Lock()
+
+# Visible output token budgets per task. gpt-5 counts reasoning tokens against
+# max_completion_tokens, so REASONING_TOKEN_BUDGET is added on top of each cap and
+# REASONING_EFFORT keeps the reasoning within that budget.
+OUTPUT_TOKEN_LIMITS = {
+    'ai_strategy': 600,
+    'investment_recommendation': 300,
+    'ai_story': 400,
+    '401k': 1200,
+}
+REASONING_TOKEN_BUDGET = 2000
+REASONING_EFFORT = "low"
+
+def completion_token_limit(*tasks):
+    """Return max_completion_tokens for a request covering the given tasks"""
+    return sum(OUTPUT_TOKEN_LIMITS[task] for task in tasks) + REASONING_TOKEN_BUDGET
+
+# Seconds between status checks while waiting on an OpenAI batch, how long to wait
+# before cancelling it, and how long a cancelled batch gets to hand back its partial
+# output. At most BATCH_MAX_LIVE_FALLBACKS symbols the batch did not answer are
+# re-analyzed live; the rest get the default analysis.
+BATCH_POLL_SECONDS = 30
+BATCH_MAX_WAIT_SECONDS = 60 * 60
+BATCH_CANCEL_GRACE_SECONDS = 10 * 60
+BATCH_MAX_LIVE_FALLBACKS = 5
+
+# System prompts for the combined stock request and for each per-task fallback
+ANALYST_SYSTEM_PROMPT = (
+    "You are a senior AI investment analyst with deep knowledge of technology companies "
+    "and their AI strategies. Provide clear, actionable investment recommendations and "
+    "compelling, factual investment narratives."
+)
+AI_STRATEGY_SYSTEM_PROMPT = (
+    "You are an expert AI investment analyst with deep knowledge of technology companies "
+    "and their AI strategies."
+)
+INVESTMENT_RECOMMENDATION_SYSTEM_PROMPT = (
+    "You are a senior investment analyst specializing in AI and technology investments. "
+    "Provide clear, actionable investment recommendations."
+)
+AI_STORY_SYSTEM_PROMPT = (
+    "You are an expert at creating compelling investment narratives focused on AI potential. "
+    "Be specific and factual."
+)
+
+
+# Fixed-format company block that follows the system prompt in every stock request
+COMPANY_PREFIX_TEMPLATE = (
+    "Company: {name} ({symbol})\n"
+    "Sector: {sector}\n"
+    "Industry: {industry}\n"
+    "Business Summary: {business_summary}\n"
+    "Market Cap: ${market_cap_billions:.1f}B\n"
+    "Employees: {employees:,}\n"
+)
+
+# Task prompts. These are ASCII literals, so only the interpolated fields need sanitizing.
+COMBINED_ANALYSIS_PROMPT = """
+Analyze the AI strategy and potential of the company described above.
+
+Complete the following three tasks. Tasks 2 and 3 must build on your own answer to task 1.
+
+Task 1 - AI strategy analysis. Provide a comprehensive analysis of:
+1. Current AI initiatives and strategies
+2. AI competitive advantages
+3. Potential AI revenue streams
+4. AI partnerships and collaborations
+5. Future AI opportunities
+6. AI-related risks and challenges
+
+Task 2 - Investment recommendation. Provide a clear investment recommendation (BUY/HOLD/SELL) based on AI potential with:
+1. Clear reasoning focused on AI investment merits
+2. AI potential score (0-10)
+3. Specific AI-related catalysts or concerns
+
+Task 3 - AI investment story. Create an investment narrative that includes:
+1. Strategic AI positioning summary
+2. Specific AI use cases and applications
+3. Future AI growth opportunities
+4. Competitive AI advantages
+
+Keep each list to at most 3 items and each list item to at most 120 characters.
+Keep the overall assessment and the recommendation reasoning to 2-3 sentences each.
+"""
+
+AI_STRATEGY_PROMPT = """
+Analyze the AI strategy and potential of the company described above.
+
+Please provide a comprehensive analysis of:
+1. Current AI initiatives and strategies
+2. AI competitive advantages
+3. Potential AI revenue streams
+4. AI partnerships and collaborations
+5. Future AI opportunities
+6. AI-related risks and challenges
+
+Keep each list to at most 3 items and each list item to at most 120 characters.
+Keep the overall assessment to 2-3 sentences.
+"""
+
+INVESTMENT_RECOMMENDATION_PROMPT = """
+Based on the AI analysis of the company described above, provide an investment recommendation specifically focused on AI potential.
+
+AI Analysis Summary:
+- AI Maturity Score: {ai_maturity_score}/10
+- Key AI Initiatives: {ai_initiatives}
+- Competitive Advantages: {competitive_advantages}
+- AI Opportunities: {opportunities}
+
+Provide a clear investment recommendation (BUY/HOLD/SELL) based on AI potential with:
+1. Clear reasoning focused on AI investment merits
+2. AI potential score (0-10)
+3. Specific AI-related catalysts or concerns
+
+Keep each list to at most 3 items and each list item to at most 120 characters.
+Keep the reasoning to 2-3 sentences.
+"""
+
+AI_STORY_PROMPT = """
+Create a compelling AI investment story for the company described above.
+
+Based on this AI analysis:
+- AI Initiatives: {ai_initiatives}
+- Competitive Advantages: {competitive_advantages}
+- AI Opportunities: {opportunities}
+- Revenue Streams: {revenue_streams}
+
+Create an investment narrative that includes:
+1. Strategic AI positioning summary
+2. Specific AI use cases and applications
+3. Future AI growth opportunities
+4. Competitive AI advantages
+
+Keep each list to at most 3 items and each list item to at most 120 characters.
+Keep the strategy summary to 2-3 sentences.
+"""
+
+
+# Structured output schemas. The OpenAI SDK validates responses against these
+# models; results are converted back to plain dicts for caching and the UI.
+class AIStrategy(BaseModel):
+    ai_initiatives: list[str]
+    competitive_advantages: list[str]
+    revenue_streams: list[str]
+    partnerships: list[str]
+    opportunities: list[str]
+    risks: list[str]
+    ai_maturity_score: int = Field(description="AI maturity score from 0 to 10")
+    overall_assessment: str = Field(description="Detailed assessment")
+
+
+class InvestmentRec(BaseModel):
+    action: Literal["BUY", "HOLD", "SELL"]
+    ai_score: int = Field(description="AI potential score from 0 to 10")
+    reasoning: str = Field(description="Detailed reasoning focusing on AI investment potential")
+    key_catalysts: list[str]
+    risk_factors: list[str]
+
+
+class AIStory(BaseModel):
+    strategy_summary: str = Field(description="2-3 sentence summary of AI strategy")
+    use_cases: list[str] = Field(description="Specific AI use cases")
+    opportunities: list[str] = Field(description="Growth opportunities")
+    competitive_advantages: list[str]
+
+
+class CombinedAnalysis(BaseModel):
+    ai_strategy: AIStrategy
+    investment_recommendation: InvestmentRec
+    ai_story: AIStory
+
+
+class K401Overview(BaseModel):
+    match_percentage: int = Field(description="Company match percentage, 0-100")
+    max_match_salary_percent: int = Field(description="Maximum matched percent of salary, 0-15")
+    vesting_period: str = Field(description="immediate/1 year/2 years/etc")
+    roth_available: bool
+    company_size: Literal["startup", "mid-size", "large enterprise"]
+    industry_rating: Literal["below average", "average", "above average", "excellent"]
+
+
+class K401Recommendation(BaseModel):
+    optimization_score: int = Field(description="Optimization score from 0 to 10")
+    primary_advice: str = Field(description="Main recommendation")
+    key_actions: list[str]
+    urgency_level: Literal["low", "medium", "high"]
+
+
+class K401ContributionStrategy(BaseModel):
+    recommended_contribution_percent: float = Field(description="Recommended contribution percent, 0-30")
+    annual_savings_potential: str = Field(description="Range such as $X,XXX - $XX,XXX")
+    tax_optimization: str = Field(description="Details about tax benefits")
+    recommended_actions: list[str]
+
+
+class K401RothAnalysis(BaseModel):
+    recommendation: Literal["Roth", "Traditional", "Mix"]
+    reasoning: str = Field(description="Detailed explanation")
+    age_considerations: str = Field(description="Advice based on career stage")
+    tax_bracket_impact: str = Field(description="Current vs future tax considerations")
+
+
+class K401FundOptions(BaseModel):
+    fund_categories: list[str] = Field(description="e.g. Large Cap, International, Bonds, Target Date")
+    recommended_funds: list[str]
+    expense_ratio_analysis: str = Field(description="low/medium/high cost funds available")
+    diversification_advice: str = Field(description="Portfolio allocation recommendations")
+
+
+class K401AdditionalBenefits(BaseModel):
+    other_benefits: list[str] = Field(description="e.g. pension, stock options, HSA")
+    financial_wellness_perks: list[str] = Field(description="e.g. financial advisor access, planning tools")
+    catch_up_contributions: str = Field(description="Catch-up contributions for 50+ employees")
+    loan_provisions: str = Field(description="Details about 401k loans if available")
+
+
+class K401Analysis(BaseModel):
+    overview: K401Overview
+    recommendation: K401Recommendation
+    contribution_strategy: K401ContributionStrategy
+    roth_analysis: K401RothAnalysis
+    fund_options: K401FundOptions
+    additional_benefits: K401AdditionalBenefits
+
+
+# Fallback 401K structures. DEFAULT_401K_BENEFITS is returned when the OpenAI call fails;
+# the analysis fallback (used when the whole 401K analysis fails) overrides some fields.
+DEFAULT_401K_BENEFITS = {
+    'overview': {
+        'match_percentage': 0,
+        'max_match_salary_percent': 0,
+        'vesting_period': 'Unknown',
+        'roth_available': False,
+        'company_size': 'Unknown',
+        'industry_rating': 'Unknown'
+    },
+    'recommendation': {
+        'optimization_score': 5,
+        'primary_advice': '401K analysis temporarily unavailable.',
+        'key_actions': ['Contribute at least enough to get company match', 'Review plan documents'],
+        'urgency_level': 'medium'
+    },
+    'contribution_strategy': {
+        'recommended_contribution_percent': 10,
+        'annual_savings_potential': 'Not calculated',
+        'tax_optimization': 'Standard tax-deferred benefits apply',
+        'recommended_actions': ['Start with company match', 'Increase contributions annually']
+    },
+    'roth_analysis': {
+        'recommendation': 'Traditional',
+        'reasoning': 'Default recommendation for tax-deferred savings',
+        'age_considerations': 'Younger employees may benefit from Roth options',
+        'tax_bracket_impact': 'Consider current vs expected future tax rates'
+    },
+    'fund_options': {
+        'fund_categories': ['Target Date Funds', 'Index Funds', 'Bond Funds'],
+        'recommended_funds': ['Low-cost index funds', 'Target-date funds for simplicity'],
+        'expense_ratio_analysis': 'Look for funds with expense ratios under 0.5%',
+        'diversification_advice': 'Mix of stocks, bonds, and international exposure'
+    },
+    'additional_benefits': {
+        'other_benefits': ['Standard 401k benefits'],
+        'financial_wellness_perks': ['Online planning tools'],
+        'catch_up_contributions': 'Available for employees 50 and older',
+        'loan_provisions': 'Check with HR for loan availability'
+    }
+}
+
+DEFAULT_401K_ANALYSIS_OVERRIDES = {
+    'recommendation': {
+        'primary_advice': '401K analysis not available at this time.',
+        'key_actions': []
+    },
+    'contribution_strategy': {
+        'tax_optimization': 'Consult with financial advisor',
+        'recommended_actions': ['Contribute enough to get company match']
+    },
+    'roth_analysis': {
+        'reasoning': 'Analysis not available',
+        'age_considerations': 'Consider your current tax bracket',
+        'tax_bracket_impact': 'Consult tax professional'
+    },
+    'fund_options': {
+        'fund_categories': [],
+        'recommended_funds': [],
+        'expense_ratio_analysis': 'Unknown',
+        'diversification_advice': 'Diversify investments across asset classes'
+    },
+    'additional_benefits': {
+        'other_benefits': [],
+        'financial_wellness_perks': [],
+        'catch_up_contributions': 'Check if available for 50+',
+        'loan_provisions': 'Check plan details'
+    }
+}
+
+# Sector multipliers used to estimate AI revenue exposure
+_SECTOR_AI_MULT = {
+    'Technology': 1.5,
+    'Communication Services': 1.2,
+    'Consumer Cyclical': 1.0,
+    'Healthcare': 1.1,
+    'Financial Services': 1.1,
+    'Industrials': 0.8,
+    'Consumer Defensive': 0.7
+}
+
+def _strict_schema(node):
+    """Make a JSON schema strict in place: closed objects with every property required"""
+    if isinstance(node, dict):
+        if node.get('type') == 'object' and 'properties' in node:
+            node['additionalProperties'] = False
+            node['required'] = list(node['properties'])
+        for value in node.values():
+            _strict_schema(value)
+    elif isinstance(node, list):
+        for value in node:
+            _strict_schema(value)
+    return node
+
+def _response_format_param(model):
+    """Build the strict json_schema response_format for a raw request body, as used in batches"""
+    try:
+        # Private SDK helper that yields the same strict schema parse() sends; it is
+        # imported lazily so an SDK reorganization only affects the batch path
+        from openai.lib._parsing._completions import type_to_response_format_param
+        return type_to_response_format_param(model)
+    except ImportError:
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": model.__name__,
+                "schema": _strict_schema(model.model_json_schema()),
+                "strict": True
+            }
+        }
+
+def _overlay_sections(base, overrides):
+    """Return a deep copy of base with each section updated from overrides"""
+    result = copy.deepcopy(base)
+    for section, values in overrides.items():
+        result[section].update(copy.deepcopy(values))
+    return result
+
+
 class AIAnalyzer:
     """Class to perform AI-powered analysis of companies for AI investment potential"""
     
+    # OpenAI clients shared across analyzer instances, keyed by API key, so each
+    # process keeps one warm connection pool. The OpenAI client is thread-safe.
+    _client_cache = {}
+    _client_lock = threading.Lock()
+    
     def __init__(self):
         # the newest OpenAI model is "gpt-5" which was released August 7, 2025.
         # do not change this unless explicitly requested by the user
@@ -63,10 +457,9 @@ class AIAnalyzer:
             raise RuntimeError("OPENAI_API_KEY is not set")
         
         # Validate API key for Unicode characters that break HTTP headers
-        try:
-            api_key.encode('ascii')
-        except UnicodeEncodeError as e:
-            safe_log(f"OPENAI_API_KEY contains non-ASCII characters at position {e.start}")
+        if not api_key.isascii():
+            position = next(i for i, ch in enumerate(api_key) if not ch.isascii())
+            safe_log(f"OPENAI_API_KEY contains non-ASCII characters at position {position}")
             if '\u2014' in api_key or '\u2013' in api_key:
                 raise RuntimeError(
                     "OPENAI_API_KEY contains em-dash or en-dash characters that break HTTP headers. "
@@ -79,8 +472,25 @@ class AIAnalyzer:
                     f"Please reset your OPENAI_API_KEY with a clean ASCII key."
                 )
         
-        self.openai_client = OpenAI(api_key=api_key)
+        self.openai_client = self._get_shared_client(api_key)
         self.model = "gpt-5"
+        self._cache = diskcache.Cache(CACHE_DIR) if diskcache is not None else None
+    
+    @classmethod
+    def _get_shared_client(cls, api_key):
+        """Return the process-wide OpenAI client for api_key, creating it on first use"""
+        with cls._client_lock:
+            client = cls._client_cache.get(api_key)
+            if client is None:
+                client = OpenAI(
+                    api_key=api_key,
+                    http_client=DefaultHttpxClient(
+                        http2=_HTTP2_AVAILABLE,
+                        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+                    )
+                )
+                cls._client_cache[api_key] = client
+            return client
     
     def analyze_ai_potential(self, symbol, company_info):
         """
@@ -100,33 +510,83 @@ class AIAnalyzer:
             company_context = self._prepare_company_context(symbol, company_info)
             safe_log(f"DEBUG: Company context prepared for {company_context.get('name', 'Unknown')}")
             
-            # Get AI strategy analysis
-            safe_log("DEBUG: About to call _analyze_ai_strategy...")
-            ai_strategy_analysis = self._analyze_ai_strategy(company_context)
-            safe_log(f"DEBUG: AI strategy analysis returned: {ai_strategy_analysis}")
-            
-            # Get investment recommendation
-            investment_recommendation = self._get_investment_recommendation(company_context, ai_strategy_analysis)
-            
-            # Calculate AI metrics
-            ai_metrics = self._calculate_ai_metrics(company_context, ai_strategy_analysis)
+            # Get strategy, recommendation and story in a single request
+            safe_log("DEBUG: About to call _analyze_all...")
+            combined = self._analyze_all(company_context)
             
-            # Generate AI story
-            ai_story = self._generate_ai_story(company_context, ai_strategy_analysis)
-            
-            return {
-                'investment_recommendation': investment_recommendation,
-                'ai_metrics': ai_metrics,
-                'ai_story': ai_story,
-                'analysis_timestamp': self._get_timestamp()
-            }
+            return self._assemble_analysis(company_context, combined)
             
+        except LengthFinishReasonError as e:
+            # The per-task fallbacks would most likely be truncated too, so don't pay for them
+            safe_log(f"Combined AI analysis hit the completion token cap, skipping per-task requests: {e.completion.usage}")
+            return self._get_default_analysis()
         except Exception as e:
             safe_log(f"=== CRITICAL ERROR in analyze_ai_potential: {str(e)} ===")
             import traceback
             safe_log(f"Full traceback: {traceback.format_exc()}")
             return self._get_default_analysis()
     
+    def analyze_ai_potential_batch(self, symbols_and_infos, use_batch=True, poll_interval=BATCH_POLL_SECONDS,
+                                   max_wait=BATCH_MAX_WAIT_SECONDS, max_live_fallbacks=BATCH_MAX_LIVE_FALLBACKS):
+        """
+        Analyze several companies at once through the OpenAI Batch API
+        
+        Batch requests are billed at half price but can take up to the 24h completion
+        window, so this blocks until the batch finishes or max_wait elapses, in which
+        case the batch is cancelled and whatever it completed is kept. Symbols with a
+        cached response are not submitted. Symbols whose batch response hit the
+        completion token cap get the default analysis, since a live retry with the same
+        caps would be cut off as well. Up to max_live_fallbacks other symbols the batch
+        does not return are analyzed with the live path; the rest get the default analysis.
+        
+        Args:
+            symbols_and_infos (dict): Mapping of stock ticker symbol to company information from yfinance
+            use_batch (bool): Submit through the Batch API; if False, analyze each symbol live
+            poll_interval (int): Seconds to wait between batch status checks
+            max_wait (int): Seconds to wait for the batch before cancelling it
+            max_live_fallbacks (int): Most symbols to re-analyze live when the batch misses them
+            
+        Returns:
+            dict: Mapping of symbol to AI analysis results
+        """
+        symbols_and_infos = dict(symbols_and_infos)
+        if not use_batch:
+            return {symbol: self.analyze_ai_potential(symbol, info)
+                    for symbol, info in symbols_and_infos.items()}
+        
+        contexts = {symbol: self._prepare_company_context(symbol, info)
+                    for symbol, info in symbols_and_infos.items()}
+        
+        combined_results = {}
+        truncated = set()
+        try:
+            combined_results, truncated = self._run_combined_batch(contexts, poll_interval, max_wait)
+        except Exception as e:
+            safe_log(f"Error in batch AI analysis, falling back to live requests: {str(e)}")
+        
+        results = {}
+        for symbol, company_context in contexts.items():
+            if symbol in truncated:
+                results[symbol] = self._get_default_analysis()
+                continue
+            combined = combined_results.get(symbol)
+            if combined is None:
+                # Bound the live fallbacks so a failed batch isn't paid for twice at full price
+                if max_live_fallbacks <= 0:
+                    safe_log(f"No batch result for {symbol} and live fallback limit reached, using defaults")
+                    results[symbol] = self._get_default_analysis()
+                    continue
+                max_live_fallbacks -= 1
+                safe_log(f"DEBUG: No batch result for {symbol}, using live analysis")
+                results[symbol] = self.analyze_ai_potential(symbol, symbols_and_infos[symbol])
+                continue
+            try:
+                results[symbol] = self._assemble_analysis(company_context, combined)
+            except Exception as e:
+                safe_log(f"Error assembling batch analysis for {symbol}: {str(e)}")
+                results[symbol] = self._get_default_analysis()
+        return results
+    
     def analyze_company_401k(self, company_name):
         """
         Analyze a company's 401K benefits and provide optimization recommendations using OpenAI
@@ -150,7 +610,8 @@ class AIAnalyzer:
                 'roth_analysis': analysis_result.get('roth_analysis', {}),
                 'fund_options': analysis_result.get('fund_options', {}),
                 'additional_benefits': analysis_result.get('additional_benefits', {}),
-                'analysis_timestamp': self._get_timestamp()
+                'analysis_timestamp': self._get_timestamp(),
+                'is_fallback': not analysis_result or analysis_result.get('is_fallback', False)
             }
             
         except Exception as e:
@@ -175,67 +636,23 @@ class AIAnalyzer:
             7. Comparison to industry standards
             8. Personalized recommendations for maximizing benefits
             
-            Respond in JSON format with the following structure:
-            {{
-                "overview": {{
-                    "match_percentage": 0-100,
-                    "max_match_salary_percent": 0-15,
-                    "vesting_period": "immediate/1 year/2 years/etc",
-                    "roth_available": true/false,
-                    "company_size": "startup/mid-size/large enterprise",
-                    "industry_rating": "below average/average/above average/excellent"
-                }},
-                "recommendation": {{
-                    "optimization_score": 0-10,
-                    "primary_advice": "main recommendation",
-                    "key_actions": ["action1", "action2", "action3"],
-                    "urgency_level": "low/medium/high"
-                }},
-                "contribution_strategy": {{
-                    "recommended_contribution_percent": 0-30,
-                    "annual_savings_potential": "$X,XXX - $XX,XXX",
-                    "tax_optimization": "details about tax benefits",
-                    "recommended_actions": ["specific action 1", "specific action 2"]
-                }},
-                "roth_analysis": {{
-                    "recommendation": "Roth/Traditional/Mix",
-                    "reasoning": "detailed explanation",
-                    "age_considerations": "advice based on career stage",
-                    "tax_bracket_impact": "current vs future tax considerations"
-                }},
-                "fund_options": {{
-                    "fund_categories": ["Large Cap", "International", "Bonds", "Target Date"],
-                    "recommended_funds": ["specific fund recommendation 1", "fund recommendation 2"],
-                    "expense_ratio_analysis": "low/medium/high cost funds available",
-                    "diversification_advice": "portfolio allocation recommendations"
-                }},
-                "additional_benefits": {{
-                    "other_benefits": ["pension", "stock options", "HSA", "etc"],
-                    "financial_wellness_perks": ["financial advisor access", "planning tools"],
-                    "catch_up_contributions": "available for 50+ employees",
-                    "loan_provisions": "details about 401k loans if available"
-                }}
-            }}
-            
             Base your analysis on typical benefits for companies of this size and industry. 
             For well-known companies, use publicly available information about their actual benefits.
             Provide specific, actionable recommendations.
+            Keep each list to at most 3 items and each string to at most 120 characters.
             """
             
             safe_log("Calling OpenAI API for 401K benefits analysis...")
-            response = self.openai_client.chat.completions.create(
-                model=self.model,
+            result = self._cached_chat(
                 messages=[
                     {"role": "system", "content": "You are an expert financial advisor and benefits analyst specializing in 401K plans and retirement optimization. Provide detailed, practical advice based on current industry standards and best practices."},
                     {"role": "user", "content": prompt}
                 ],
-                response_format={"type": "json_object"}
+                response_format=K401Analysis,
+                max_completion_tokens=completion_token_limit('401k')
             )
             
             safe_log("OpenAI API response received, processing 401K analysis...")
-            
-            # Use safe JSON parser to handle encoding issues
-            result = self._parse_openai_json(response)
             if result:
                 safe_log(f"401K analysis completed successfully with {len(result)} sections")
                 return result
@@ -249,103 +666,84 @@ class AIAnalyzer:
     
     def _get_default_401k_analysis(self):
         """Return default 401K analysis structure when analysis fails"""
-        return {
-            'overview': {
-                'match_percentage': 0,
-                'max_match_salary_percent': 0,
-                'vesting_period': 'Unknown',
-                'roth_available': False,
-                'company_size': 'Unknown',
-                'industry_rating': 'Unknown'
-            },
-            'recommendation': {
-                'optimization_score': 5,
-                'primary_advice': '401K analysis not available at this time.',
-                'key_actions': [],
-                'urgency_level': 'medium'
-            },
-            'contribution_strategy': {
-                'recommended_contribution_percent': 10,
-                'annual_savings_potential': 'Not calculated',
-                'tax_optimization': 'Consult with financial advisor',
-                'recommended_actions': ['Contribute enough to get company match']
-            },
-            'roth_analysis': {
-                'recommendation': 'Traditional',
-                'reasoning': 'Analysis not available',
-                'age_considerations': 'Consider your current tax bracket',
-                'tax_bracket_impact': 'Consult tax professional'
-            },
-            'fund_options': {
-                'fund_categories': [],
-                'recommended_funds': [],
-                'expense_ratio_analysis': 'Unknown',
-                'diversification_advice': 'Diversify investments across asset classes'
-            },
-            'additional_benefits': {
-                'other_benefits': [],
-                'financial_wellness_perks': [],
-                'catch_up_contributions': 'Check if available for 50+',
-                'loan_provisions': 'Check plan details'
-            },
-            'analysis_timestamp': self._get_timestamp()
-        }
+        analysis = _overlay_sections(DEFAULT_401K_BENEFITS, DEFAULT_401K_ANALYSIS_OVERRIDES)
+        analysis['analysis_timestamp'] = self._get_timestamp()
+        analysis['is_fallback'] = True
+        return analysis
     
     def _get_default_401k_benefits(self):
         """Return default 401K benefits structure when OpenAI analysis fails"""
-        return {
-            'overview': {
-                'match_percentage': 0,
-                'max_match_salary_percent': 0,
-                'vesting_period': 'Unknown',
-                'roth_available': False,
-                'company_size': 'Unknown',
-                'industry_rating': 'Unknown'
-            },
-            'recommendation': {
-                'optimization_score': 5,
-                'primary_advice': '401K analysis temporarily unavailable.',
-                'key_actions': ['Contribute at least enough to get company match', 'Review plan documents'],
-                'urgency_level': 'medium'
-            },
-            'contribution_strategy': {
-                'recommended_contribution_percent': 10,
-                'annual_savings_potential': 'Not calculated',
-                'tax_optimization': 'Standard tax-deferred benefits apply',
-                'recommended_actions': ['Start with company match', 'Increase contributions annually']
-            },
-            'roth_analysis': {
-                'recommendation': 'Traditional',
-                'reasoning': 'Default recommendation for tax-deferred savings',
-                'age_considerations': 'Younger employees may benefit from Roth options',
-                'tax_bracket_impact': 'Consider current vs expected future tax rates'
-            },
-            'fund_options': {
-                'fund_categories': ['Target Date Funds', 'Index Funds', 'Bond Funds'],
-                'recommended_funds': ['Low-cost index funds', 'Target-date funds for simplicity'],
-                'expense_ratio_analysis': 'Look for funds with expense ratios under 0.5%',
-                'diversification_advice': 'Mix of stocks, bonds, and international exposure'
-            },
-            'additional_benefits': {
-                'other_benefits': ['Standard 401k benefits'],
-                'financial_wellness_perks': ['Online planning tools'],
-                'catch_up_contributions': 'Available for employees 50 and older',
-                'loan_provisions': 'Check with HR for loan availability'
-            }
-        }
+        benefits = copy.deepcopy(DEFAULT_401K_BENEFITS)
+        benefits['is_fallback'] = True
+        return benefits
+    
+    def _cached_chat(self, messages, response_format, **kwargs):
+        """Call OpenAI with a structured output schema through the response cache and return a dict"""
+        kwargs.setdefault('reasoning_effort', REASONING_EFFORT)
+        key = self._cache_key(messages, response_format, **kwargs)
+        
+        cached = self._cache_get(key)
+        if cached is not None:
+            safe_log("DEBUG: Returning cached OpenAI response")
+            return cached
+        
+        response = self.openai_client.chat.completions.parse(
+            model=self.model,
+            messages=messages,
+            response_format=response_format,
+            **kwargs
+        )
+        
+        result = self._parse_openai_json(response)
+        if result:
+            self._cache_set(key, result)
+        return result
+    
+    def _cache_key(self, messages, response_format, **kwargs):
+        """Hash the model, messages, output schema and request options into a cache key"""
+        payload = json.dumps({
+            'model': self.model,
+            'messages': messages,
+            'response_format': response_format.model_json_schema(),
+            **kwargs
+        }, sort_keys=True)
+        return hashlib.blake2b(payload.encode('utf-8')).hexdigest()
+    
+    def _cache_get(self, key):
+        """Look up a cached response, falling back to the in-process cache without diskcache"""
+        if self._cache is not None:
+            return self._cache.get(key)
+        with _memory_cache_lock:
+            entry = _memory_cache.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del _memory_cache[key]
+                return None
+            _memory_cache.move_to_end(key)
+        return copy.deepcopy(value)
+    
+    def _cache_set(self, key, value):
+        """Store a response for CACHE_TTL_SECONDS"""
+        if self._cache is not None:
+            self._cache.set(key, value, expire=CACHE_TTL_SECONDS)
+        else:
+            entry = (time.time() + CACHE_TTL_SECONDS, copy.deepcopy(value))
+            with _memory_cache_lock:
+                _memory_cache[key] = entry
+                _memory_cache.move_to_end(key)
+                # Evict the least recently used entries once the cache is full
+                while len(_memory_cache) > MEMORY_CACHE_MAX_ENTRIES:
+                    _memory_cache.popitem(last=False)
     
     def _parse_openai_json(self, response):
         msg = response.choices[0].message
-        parsed = getattr(msg, "parsed", None)
-        if parsed is not None:
-            return parsed
-        content = getattr(msg, "content", None)
-        if isinstance(content, str) and content.strip():
-            try:
-                return json.loads(content)
-            except json.JSONDecodeError:
-                return {}
-        return {}
+        if msg.parsed is None:
+            if getattr(msg, "refusal", None):
+                safe_log(f"OpenAI refused the request: {msg.refusal}")
+            return {}
+        return msg.parsed.model_dump()
     
     def _prepare_company_context(self, symbol, company_info):
         """Prepare company context for AI analysis"""
@@ -362,6 +760,220 @@ class AIAnalyzer:
             'country': company_info.get('country', 'Unknown')
         }
     
+    def _static_prefix(self, company_context):
+        """Build the invariant company block shared by every request for a symbol"""
+        # Sanitize all text fields to prevent Unicode errors
+        return COMPANY_PREFIX_TEMPLATE.format(
+            name=sanitize_text(company_context.get('name', 'Unknown')),
+            symbol=sanitize_text(company_context['symbol']),
+            sector=sanitize_text(company_context['sector']),
+            industry=sanitize_text(company_context['industry']),
+            # Truncate before sanitizing; the slack absorbs NFKC expansion
+            business_summary=sanitize_text(company_context.get('business_summary', '')[:1200])[:1000],
+            market_cap_billions=company_context['market_cap'] / 1e9,
+            employees=company_context['employees']
+        )
+    
+    def _build_messages(self, system_prompt, company_context, prompt):
+        """Assemble messages as system prompt, shared company block, then the task"""
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": self._static_prefix(company_context)},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _get_section(self, combined, key):
+        """Return a section of the combined analysis, or None if it is missing or malformed"""
+        section = combined.get(key) if isinstance(combined, dict) else None
+        if isinstance(section, dict) and section:
+            return section
+        return None
+    
+    def _run_combined_batch(self, contexts, poll_interval, max_wait):
+        """
+        Submit combined analysis requests as one OpenAI batch
+        
+        Returns:
+            tuple: (parsed results by symbol, set of symbols cut off by the completion token cap)
+        """
+        prompt = COMBINED_ANALYSIS_PROMPT
+        options = {
+            'max_completion_tokens': completion_token_limit('ai_strategy', 'investment_recommendation', 'ai_story'),
+            'reasoning_effort': REASONING_EFFORT
+        }
+        
+        results = {}
+        lines = []
+        cache_keys = {}
+        for symbol, company_context in contexts.items():
+            messages = self._build_messages(ANALYST_SYSTEM_PROMPT, company_context, prompt)
+            key = self._cache_key(messages, CombinedAnalysis, **options)
+            
+            # Symbols answered recently are served from the cache instead of re-billed
+            cached = self._cache_get(key)
+            if cached is not None:
+                results[symbol] = cached
+                continue
+            
+            cache_keys[symbol] = key
+            lines.append(json.dumps({
+                "custom_id": symbol,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.model,
+                    "messages": messages,
+                    "response_format": _response_format_param(CombinedAnalysis),
+                    **options
+                }
+            }))
+        
+        if not lines:
+            safe_log("DEBUG: All batch symbols were cached, skipping the OpenAI batch")
+            return results, set()
+        
+        safe_log(f"Submitting OpenAI batch for {len(lines)} symbols...")
+        batch_file = self.openai_client.files.create(
+            file=("ai_analysis_batch.jsonl", "\n".join(lines).encode('utf-8')),
+            purpose="batch"
+        )
+        batch = self.openai_client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        
+        deadline = time.monotonic() + max_wait
+        cancelling = False
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            if time.monotonic() >= deadline:
+                if cancelling:
+                    safe_log(f"OpenAI batch {batch.id} did not finish cancelling, dropping its output")
+                    return results, set()
+                safe_log(f"OpenAI batch {batch.id} still {batch.status} after {max_wait}s, cancelling it")
+                try:
+                    self.openai_client.batches.cancel(batch.id)
+                except Exception as e:
+                    safe_log(f"Error cancelling OpenAI batch {batch.id}: {str(e)}")
+                    return results, set()
+                # A cancelled batch still returns the requests it completed
+                cancelling = True
+                deadline = time.monotonic() + BATCH_CANCEL_GRACE_SECONDS
+            time.sleep(poll_interval)
+            batch = self.openai_client.batches.retrieve(batch.id)
+            safe_log(f"DEBUG: Batch {batch.id} status: {batch.status}")
+        
+        if batch.status != "completed":
+            safe_log(f"OpenAI batch {batch.id} finished with status {batch.status}")
+        if not batch.output_file_id:
+            return results, set()
+        
+        batch_results, truncated = self._read_batch_output(batch.output_file_id, cache_keys)
+        results.update(batch_results)
+        safe_log(f"OpenAI batch returned {len(batch_results)} of {len(lines)} results")
+        return results, truncated
+    
+    def _read_batch_output(self, output_file_id, cache_keys):
+        """Parse a batch output file into results by symbol and the set of truncated symbols"""
+        results = {}
+        truncated = set()
+        output = self.openai_client.files.content(output_file_id).text
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            item = _json_loads(line)
+            response = item.get('response') or {}
+            if item.get('error') or response.get('status_code') != 200:
+                safe_log(f"Batch request for {item.get('custom_id')} failed: {item.get('error')}")
+                continue
+            try:
+                choice = response['body']['choices'][0]
+                if choice.get('finish_reason') == 'length':
+                    safe_log(f"Batch request for {item.get('custom_id')} hit the completion token cap")
+                    truncated.add(item.get('custom_id'))
+                    continue
+                content = choice['message']['content']
+                result = CombinedAnalysis.model_validate_json(content).model_dump()
+            except (KeyError, IndexError, TypeError, ValueError):
+                continue
+            symbol = item.get('custom_id')
+            if result and symbol in cache_keys:
+                # Warm the response cache so live requests for the same symbol are free
+                self._cache_set(cache_keys[symbol], result)
+                results[symbol] = result
+        return results, truncated
+    
+    def _assemble_analysis(self, company_context, combined):
+        """Build the final analysis from a combined response, filling any missing sections"""
+        ai_strategy_analysis = self._get_section(combined, 'ai_strategy')
+        investment_recommendation = self._get_section(combined, 'investment_recommendation')
+        ai_story = self._get_section(combined, 'ai_story')
+        safe_log(f"DEBUG: AI strategy analysis returned: {ai_strategy_analysis}")
+        
+        # Fall back to the per-task requests for any section the combined call missed
+        if not ai_strategy_analysis:
+            safe_log("DEBUG: Combined AI strategy missing, calling _analyze_ai_strategy...")
+            ai_strategy_analysis = self._analyze_ai_strategy(company_context)
+        
+        # Recommendation and story only depend on the strategy, so run them concurrently
+        if not investment_recommendation or not ai_story:
+            futures = {}
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                if not investment_recommendation:
+                    futures['investment_recommendation'] = executor.submit(
+                        self._get_investment_recommendation, company_context, ai_strategy_analysis)
+                if not ai_story:
+                    futures['ai_story'] = executor.submit(
+                        self._generate_ai_story, company_context, ai_strategy_analysis)
+            if 'investment_recommendation' in futures:
+                investment_recommendation = futures['investment_recommendation'].result()
+            if 'ai_story' in futures:
+                ai_story = futures['ai_story'].result()
+        
+        # Calculate AI metrics locally from the strategy analysis
+        ai_metrics = self._calculate_ai_metrics(company_context, ai_strategy_analysis)
+        
+        return {
+            'investment_recommendation': investment_recommendation,
+            'ai_metrics': ai_metrics,
+            'ai_story': ai_story,
+            'analysis_timestamp': self._get_timestamp(),
+            # Flag results built from any placeholder section so callers can retry them
+            'is_fallback': any(not section or section.get('is_fallback')
+                               for section in (ai_strategy_analysis, investment_recommendation, ai_story))
+        }
+    
+    def _analyze_all(self, company_context):
+        """Analyze AI strategy, investment recommendation and AI story in one OpenAI request"""
+        try:
+            # Sanitize all text fields to prevent Unicode errors
+            company_name = sanitize_text(company_context.get('name', 'Unknown'))
+            safe_log(f"Starting combined AI analysis for {company_name}")
+            
+            prompt = COMBINED_ANALYSIS_PROMPT
+            
+            safe_log(f"DEBUG: Prompt length: {len(prompt)} characters")
+            safe_log("Calling OpenAI API for combined AI analysis...")
+            result = self._cached_chat(
+                messages=self._build_messages(ANALYST_SYSTEM_PROMPT, company_context, prompt),
+                response_format=CombinedAnalysis,
+                max_completion_tokens=completion_token_limit('ai_strategy', 'investment_recommendation', 'ai_story')
+            )
+            
+            safe_log("OpenAI API response received, processing combined analysis...")
+            if result:
+                safe_log(f"Combined AI analysis completed successfully with {len(result)} sections")
+                return result
+            else:
+                safe_log("Failed to parse OpenAI response for combined analysis")
+                return {}
+            
+        except LengthFinishReasonError:
+            raise
+        except Exception as e:
+            safe_log(f"Error in combined AI analysis: {str(e)}")
+            return {}
+    
     def _analyze_ai_strategy(self, company_context):
         """Analyze company's AI strategy using OpenAI"""
         try:
@@ -369,60 +981,18 @@ class AIAnalyzer:
             company_name = sanitize_text(company_context.get('name', 'Unknown'))
             safe_log(f"Starting AI strategy analysis for {company_name}")
             
-            sector = sanitize_text(company_context['sector'])
-            industry = sanitize_text(company_context['industry'])
-            business_summary = sanitize_text(company_context.get('business_summary', ''))[:1000]
-            
-            prompt = f"""
-            Analyze the AI strategy and potential of {company_name} ({company_context['symbol']}).
-            
-            Company Details:
-            - Sector: {sector}
-            - Industry: {industry}
-            - Business Summary: {business_summary}
-            - Market Cap: ${company_context['market_cap']/1e9:.1f}B
-            - Employees: {company_context['employees']:,}
-            
-            Please provide a comprehensive analysis of:
-            1. Current AI initiatives and strategies
-            2. AI competitive advantages
-            3. Potential AI revenue streams
-            4. AI partnerships and collaborations
-            5. Future AI opportunities
-            6. AI-related risks and challenges
-            
-            Respond in JSON format with the following structure:
-            {{
-                "ai_initiatives": ["initiative1", "initiative2"],
-                "competitive_advantages": ["advantage1", "advantage2"],
-                "revenue_streams": ["stream1", "stream2"],
-                "partnerships": ["partner1", "partner2"],
-                "opportunities": ["opportunity1", "opportunity2"],
-                "risks": ["risk1", "risk2"],
-                "ai_maturity_score": 0-10,
-                "overall_assessment": "detailed assessment"
-            }}
-            """
-            
-            # Sanitize the complete prompt
-            prompt = sanitize_text(prompt)
+            prompt = AI_STRATEGY_PROMPT
             
             safe_log(f"DEBUG: About to call OpenAI API with model: {self.model}")
             safe_log(f"DEBUG: Prompt length: {len(prompt)} characters")
             safe_log("Calling OpenAI API for AI strategy analysis...")
-            response = self.openai_client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are an expert AI investment analyst with deep knowledge of technology companies and their AI strategies."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"}
+            result = self._cached_chat(
+                messages=self._build_messages(AI_STRATEGY_SYSTEM_PROMPT, company_context, prompt),
+                response_format=AIStrategy,
+                max_completion_tokens=completion_token_limit('ai_strategy')
             )
             
             safe_log("OpenAI API response received, processing content...")
-            
-            # Use safe JSON parser to handle encoding issues
-            result = self._parse_openai_json(response)
             if result:
                 safe_log(f"AI strategy analysis completed successfully with {len(result)} keys")
                 return result
@@ -440,60 +1010,27 @@ class AIAnalyzer:
                 "opportunities": [],
                 "risks": [],
                 "ai_maturity_score": 5,
-                "overall_assessment": "Unable to complete AI analysis at this time."
+                "overall_assessment": "Unable to complete AI analysis at this time.",
+                "is_fallback": True
             }
     
     def _get_investment_recommendation(self, company_context, ai_strategy):
         """Get AI-focused investment recommendation"""
         try:
-            # Sanitize all text fields to prevent Unicode errors
-            company_name = sanitize_text(company_context['name'])
-            sector = sanitize_text(company_context['sector'])
-            industry = sanitize_text(company_context['industry'])
-            
-            prompt = f"""
-            Based on the AI analysis of {company_name} ({company_context['symbol']}), provide an investment recommendation specifically focused on AI potential.
-            
-            Company Context:
-            - Sector: {sector}
-            - Industry: {industry}
-            - Market Cap: ${company_context['market_cap']/1e9:.1f}B
-            
-            AI Analysis Summary:
-            - AI Maturity Score: {ai_strategy.get('ai_maturity_score', 5)}/10
-            - Key AI Initiatives: {', '.join(str(x) for x in ai_strategy.get('ai_initiatives', [])[:3])}
-            - Competitive Advantages: {', '.join(str(x) for x in ai_strategy.get('competitive_advantages', [])[:3])}
-            - AI Opportunities: {', '.join(str(x) for x in ai_strategy.get('opportunities', [])[:3])}
-            
-            Provide a clear investment recommendation (BUY/HOLD/SELL) based on AI potential with:
-            1. Clear reasoning focused on AI investment merits
-            2. AI potential score (0-10)
-            3. Specific AI-related catalysts or concerns
-            
-            Respond in JSON format:
-            {{
-                "action": "BUY/HOLD/SELL",
-                "ai_score": 0-10,
-                "reasoning": "detailed reasoning focusing on AI investment potential",
-                "key_catalysts": ["catalyst1", "catalyst2"],
-                "risk_factors": ["risk1", "risk2"]
-            }}
-            """
-            
-            # Sanitize the complete prompt
-            prompt = sanitize_text(prompt)
-            
-            response = self.openai_client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a senior investment analyst specializing in AI and technology investments. Provide clear, actionable investment recommendations."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"}
+            # Sanitize only the interpolated text fields; the template itself is ASCII
+            # and the maturity score is an int
+            prompt = INVESTMENT_RECOMMENDATION_PROMPT.format(
+                ai_maturity_score=ai_strategy.get('ai_maturity_score', 5),
+                ai_initiatives=sanitize_text(', '.join(str(x) for x in ai_strategy.get('ai_initiatives', [])[:3])),
+                competitive_advantages=sanitize_text(', '.join(str(x) for x in ai_strategy.get('competitive_advantages', [])[:3])),
+                opportunities=sanitize_text(', '.join(str(x) for x in ai_strategy.get('opportunities', [])[:3]))
             )
             
-            # Use safe JSON parser to handle encoding issues
-            result = self._parse_openai_json(response)
+            result = self._cached_chat(
+                messages=self._build_messages(INVESTMENT_RECOMMENDATION_SYSTEM_PROMPT, company_context, prompt),
+                response_format=InvestmentRec,
+                max_completion_tokens=completion_token_limit('investment_recommendation')
+            )
             return result
             
         except Exception as e:
@@ -503,7 +1040,8 @@ class AIAnalyzer:
                 "ai_score": 5,
                 "reasoning": "Unable to complete investment analysis at this time.",
                 "key_catalysts": [],
-                "risk_factors": []
+                "risk_factors": [],
+                "is_fallback": True
             }
     
     def _calculate_ai_metrics(self, company_context, ai_strategy):
@@ -513,17 +1051,7 @@ class AIAnalyzer:
             ai_score = ai_strategy.get('ai_maturity_score', 5)
             
             # Estimate AI revenue exposure based on sector and AI initiatives
-            sector_ai_multipliers = {
-                'Technology': 1.5,
-                'Communication Services': 1.2,
-                'Consumer Cyclical': 1.0,
-                'Healthcare': 1.1,
-                'Financial Services': 1.1,
-                'Industrials': 0.8,
-                'Consumer Defensive': 0.7
-            }
-            
-            base_exposure = sector_ai_multipliers.get(company_context['sector'], 0.8)
+            base_exposure = _SECTOR_AI_MULT.get(company_context['sector'], 0.8)
             ai_initiatives_count = len(ai_strategy.get('ai_initiatives', []))
             estimated_ai_exposure = min(100, (base_exposure * ai_score * 2) + (ai_initiatives_count * 5))
             
@@ -550,47 +1078,19 @@ class AIAnalyzer:
     def _generate_ai_story(self, company_context, ai_strategy):
         """Generate compelling AI investment story"""
         try:
-            # Sanitize all text fields to prevent Unicode errors
-            company_name = sanitize_text(company_context['name'])
-            
-            prompt = f"""
-            Create a compelling AI investment story for {company_name} ({company_context['symbol']}).
-            
-            Based on this AI analysis:
-            - AI Initiatives: {[str(x) for x in ai_strategy.get('ai_initiatives', [])]}
-            - Competitive Advantages: {[str(x) for x in ai_strategy.get('competitive_advantages', [])]}
-            - AI Opportunities: {[str(x) for x in ai_strategy.get('opportunities', [])]}
-            - Revenue Streams: {[str(x) for x in ai_strategy.get('revenue_streams', [])]}
-            
-            Create an investment narrative that includes:
-            1. Strategic AI positioning summary
-            2. Specific AI use cases and applications
-            3. Future AI growth opportunities
-            4. Competitive AI advantages
-            
-            Respond in JSON format:
-            {{
-                "strategy_summary": "2-3 sentence summary of AI strategy",
-                "use_cases": ["specific use case 1", "specific use case 2", "specific use case 3"],
-                "opportunities": ["growth opportunity 1", "growth opportunity 2"],
-                "competitive_advantages": ["advantage 1", "advantage 2"]
-            }}
-            """
-            
-            # Sanitize the complete prompt
-            prompt = sanitize_text(prompt)
-            
-            response = self.openai_client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are an expert at creating compelling investment narratives focused on AI potential. Be specific and factual."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"}
+            # Sanitize only the interpolated fields; the template itself is ASCII
+            prompt = AI_STORY_PROMPT.format(
+                ai_initiatives=sanitize_text(str([str(x) for x in ai_strategy.get('ai_initiatives', [])])),
+                competitive_advantages=sanitize_text(str([str(x) for x in ai_strategy.get('competitive_advantages', [])])),
+                opportunities=sanitize_text(str([str(x) for x in ai_strategy.get('opportunities', [])])),
+                revenue_streams=sanitize_text(str([str(x) for x in ai_strategy.get('revenue_streams', [])]))
             )
             
-            # Use safe JSON parser to handle encoding issues
-            result = self._parse_openai_json(response)
+            result = self._cached_chat(
+                messages=self._build_messages(AI_STORY_SYSTEM_PROMPT, company_context, prompt),
+                response_format=AIStory,
+                max_completion_tokens=completion_token_limit('ai_story')
+            )
             return result
             
         except Exception as e:
@@ -599,12 +1099,12 @@ class AIAnalyzer:
                 "strategy_summary": "AI strategy analysis not available at this time.",
                 "use_cases": [],
                 "opportunities": [],
-                "competitive_advantages": []
+                "competitive_advantages": [],
+                "is_fallback": True
             }
     
     def _get_timestamp(self):
         """Get current timestamp"""
-        from datetime import datetime
         return datetime.now().isoformat()
     
     def _get_default_analysis(self):
@@ -629,5 +1129,6 @@ class AIAnalyzer:
                 'opportunities': [],
                 'competitive_advantages': []
             },
-            'analysis_timestamp': self._get_timestamp()
+            'analysis_timestamp': self._get_timestamp(),
+            'is_fallback': True
         }
\ No newline at end of file
@@ -7,11 +7,45 @@ import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime, timedelta
+import csv
 import io
 
 from stock_data import StockDataFetcher
 from ai_analysis import AIAnalyzer
 
+# Analysis period labels mapped to yfinance period strings
+PERIOD_OPTIONS = {
+    "1 Month": "1mo",
+    "3 Months": "3mo",
+    "6 Months": "6mo",
+    "1 Year": "1y",
+    "2 Years": "2y"
+}
+
+# Recommendation colors, gray for anything else
+REC_COLOR = {'BUY': 'green', 'HOLD': 'orange', 'SELL': 'red'}
+
+# Column headers of the financial metrics table and CSV
+FINANCIAL_COLUMNS = ['Metric', 'Value']
+
+# HTML cards, filled in with str.format
+REC_CARD_HTML = """
+### 🎯 AI Investment Recommendation
+<div style="padding: 1rem; border-left: 5px solid {color}; background-color: rgba(128,128,128,0.1);">
+<h4 style="color: {color}; margin: 0;">{action}</h4>
+<p style="margin: 0.5rem 0;"><strong>AI Potential Score:</strong> {score}/10</p>
+<p style="margin: 0;"><strong>Reasoning:</strong> {reasoning}</p>
+</div>
+"""
+
+K401_STATUS_HTML = """
+<div style="padding: 1rem; border-left: 5px solid {color}; background-color: rgba(128,128,128,0.1);">
+<h4 style="color: {color}; margin: 0;">401K Status: {status}</h4>
+<p style="margin: 0.5rem 0;"><strong>Optimization Score:</strong> {score}/10</p>
+<p style="margin: 0;"><strong>Key Recommendation:</strong> {advice}</p>
+</div>
+"""
+
 # Configure page
 st.set_page_config(page_title="AI Investment Analyzer",
                    page_icon="🤖",
@@ -24,6 +58,20 @@ if 'stock_data' not in st.session_state:
     st.session_state.stock_data = None
 if '401k_analysis_data' not in st.session_state:
     st.session_state['401k_analysis_data'] = None
+if 'last_fetched_key' not in st.session_state:
+    st.session_state.last_fetched_key = None
+
+
+@st.cache_resource
+def get_stock_fetcher():
+    """Return the StockDataFetcher shared across reruns and sessions"""
+    return StockDataFetcher()
+
+
+@st.cache_resource
+def get_ai_analyzer():
+    """Return the AIAnalyzer shared across reruns and sessions"""
+    return AIAnalyzer()
 
 
 def main():
@@ -42,15 +90,14 @@ def main():
         st.divider()
 
         if analysis_type == "Stock Analysis":
-            stock_symbol, selected_period, period_options, analyze_button = stock_analysis_sidebar(
+            stock_symbol, selected_period, analyze_button = stock_analysis_sidebar(
             )
         else:
             company_name, analyze_401k_button = fourk_analysis_sidebar()
 
     # Main content area (outside sidebar)
     if analysis_type == "Stock Analysis":
-        handle_stock_analysis(stock_symbol, selected_period, period_options,
-                              analyze_button)
+        handle_stock_analysis(stock_symbol, selected_period, analyze_button)
     else:
         handle_401k_analysis(company_name, analyze_401k_button)
 
@@ -63,26 +110,20 @@ def stock_analysis_sidebar():
     stock_symbol = st.text_input(
         "Enter Stock Symbol",
         placeholder="e.g., AAPL, MSFT, GOOGL",
-        help="Enter a valid stock ticker symbol").upper()
+        help="Enter a valid stock ticker symbol",
+        key="stock_symbol").upper()
 
     # Time period selection
-    period_options = {
-        "1 Month": "1mo",
-        "3 Months": "3mo",
-        "6 Months": "6mo",
-        "1 Year": "1y",
-        "2 Years": "2y"
-    }
-
     selected_period = st.selectbox(
         "Analysis Period",
-        options=list(period_options.keys()),
-        index=3  # Default to 1 year
+        options=list(PERIOD_OPTIONS.keys()),
+        index=3,  # Default to 1 year
+        key="selected_period"
     )
 
     analyze_button = st.button("🔍 Analyze Stock", type="primary")
 
-    return stock_symbol, selected_period, period_options, analyze_button
+    return stock_symbol, selected_period, analyze_button
 
 
 def fourk_analysis_sidebar():
@@ -93,26 +134,32 @@ def fourk_analysis_sidebar():
     company_name = st.text_input(
         "Enter Company Name",
         placeholder="e.g., Microsoft, Google, Apple",
-        help="Enter the company name to analyze 401K benefits")
+        help="Enter the company name to analyze 401K benefits",
+        key="company_name")
 
     analyze_401k_button = st.button("💰 Analyze 401K", type="primary")
 
     return company_name, analyze_401k_button
 
 
-def handle_stock_analysis(stock_symbol, selected_period, period_options,
-                          analyze_button):
+def handle_stock_analysis(stock_symbol, selected_period, analyze_button):
     """Handle stock analysis logic"""
-    if analyze_button and stock_symbol:
+    # Only fetch when the inputs changed since the last complete analysis; otherwise
+    # the stored results below are rendered without another round-trip
+    fetch_key = (stock_symbol, PERIOD_OPTIONS[selected_period])
+    needs_fetch = (analyze_button and stock_symbol
+                   and st.session_state.last_fetched_key != fetch_key)
+
+    if needs_fetch:
         with st.spinner("Fetching stock data and performing AI analysis..."):
             try:
-                # Initialize data fetcher and AI analyzer
-                stock_fetcher = StockDataFetcher()
-                ai_analyzer = AIAnalyzer()
+                # Get the shared data fetcher and AI analyzer
+                stock_fetcher = get_stock_fetcher()
+                ai_analyzer = get_ai_analyzer()
 
                 # Fetch stock data
                 stock_data = stock_fetcher.get_stock_data(
-                    stock_symbol, period_options[selected_period])
+                    stock_symbol, PERIOD_OPTIONS[selected_period])
 
                 if stock_data is None:
                     st.error(
@@ -127,6 +174,9 @@ def handle_stock_analysis(stock_symbol, selected_period, period_options,
                 # Store in session state
                 st.session_state.stock_data = stock_data
                 st.session_state.analysis_data = ai_analysis
+                # Placeholder results are not remembered, so pressing Analyze retries them
+                st.session_state.last_fetched_key = (
+                    None if ai_analysis.get('is_fallback') else fetch_key)
 
                 # Display results
                 display_analysis_results(stock_data, ai_analysis)
@@ -158,11 +208,19 @@ def handle_stock_analysis(stock_symbol, selected_period, period_options,
 
 def handle_401k_analysis(company_name, analyze_401k_button):
     """Handle 401K analysis logic"""
-    if analyze_401k_button and company_name:
+    # Only re-run the analysis when the company changed since the last complete one;
+    # placeholder results are always retried
+    previous = st.session_state['401k_analysis_data']
+    needs_analysis = (analyze_401k_button and company_name
+                      and (previous is None
+                           or previous['company_name'] != company_name
+                           or previous['analysis'].get('is_fallback')))
+
+    if needs_analysis:
         with st.spinner(f"Analyzing 401K benefits for {company_name}..."):
             try:
-                # Initialize AI analyzer
-                ai_analyzer = AIAnalyzer()
+                # Get the shared AI analyzer
+                ai_analyzer = get_ai_analyzer()
 
                 # Perform 401K analysis
                 fourk_analysis = ai_analyzer.analyze_company_401k(company_name)
@@ -235,17 +293,13 @@ def display_analysis_results(stock_data, ai_analysis):
 
     # Color code the recommendation
     rec_action = recommendation.get('action', 'HOLD')
-    color_map = {'BUY': 'green', 'HOLD': 'orange', 'SELL': 'red'}
-    color = color_map.get(rec_action, 'gray')
-
-    st.markdown(f"""
-    ### 🎯 AI Investment Recommendation
-    <div style="padding: 1rem; border-left: 5px solid {color}; background-color: rgba(128,128,128,0.1);">
-    <h4 style="color: {color}; margin: 0;">{rec_action}</h4>
-    <p style="margin: 0.5rem 0;"><strong>AI Potential Score:</strong> {recommendation.get('ai_score', 0)}/10</p>
-    <p style="margin: 0;"><strong>Reasoning:</strong> {recommendation.get('reasoning', 'No reasoning provided')}</p>
-    </div>
-    """,
+    color = REC_COLOR.get(rec_action, 'gray')
+
+    st.markdown(REC_CARD_HTML.format(
+        color=color,
+        action=rec_action,
+        score=recommendation.get('ai_score', 0),
+        reasoning=recommendation.get('reasoning', 'No reasoning provided')),
                 unsafe_allow_html=True)
 
     # Key AI Metrics
@@ -281,81 +335,36 @@ def display_analysis_results(stock_data, ai_analysis):
                          'No AI strategy information available.'))
 
         st.markdown("**Key AI Use Cases:**")
-        use_cases = ai_story.get('use_cases', [])
-        if use_cases:
-            for use_case in use_cases:
-                st.write(f"• {use_case}")
-        else:
-            st.write("No specific AI use cases identified.")
+        _bullets(ai_story.get('use_cases', []),
+                 "No specific AI use cases identified.")
 
     with col2:
         st.markdown("**AI Opportunities:**")
-        opportunities = ai_story.get('opportunities', [])
-        if opportunities:
-            for opp in opportunities:
-                st.write(f"• {opp}")
-        else:
-            st.write("No specific AI opportunities identified.")
+        _bullets(ai_story.get('opportunities', []),
+                 "No specific AI opportunities identified.")
 
         st.markdown("**Competitive AI Advantages:**")
-        advantages = ai_story.get('competitive_advantages', [])
-        if advantages:
-            for adv in advantages:
-                st.write(f"• {adv}")
-        else:
-            st.write("No specific competitive AI advantages identified.")
+        _bullets(ai_story.get('competitive_advantages', []),
+                 "No specific competitive AI advantages identified.")
 
     # Stock Price Chart
     st.markdown("### 📊 Stock Price Performance")
 
     if not price_data.empty:
-        fig = go.Figure()
-
-        fig.add_trace(
-            go.Scatter(x=price_data.index,
-                       y=price_data['Close'],
-                       mode='lines',
-                       name='Close Price',
-                       line=dict(color='#1f77b4', width=2)))
-
-        fig.update_layout(
-            title=f"{company_info.get('symbol', 'Stock')} Price Chart",
-            xaxis_title="Date",
-            yaxis_title="Price ($)",
-            hovermode='x unified',
-            showlegend=True)
-
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(build_price_chart(company_info.get('symbol', 'Stock'),
+                                          price_data),
+                        use_container_width=True)
 
     # Financial Data Table
     st.markdown("### 📋 Key Financial Data")
 
-    # Prepare financial data for table
-    financial_data = {
-        'Metric': [
-            'Current Price', 'Previous Close', 'Day High', 'Day Low', 'Volume',
-            'Market Cap', 'P/E Ratio', 'EPS', 'Dividend Yield', 'Beta'
-        ],
-        'Value': [
-            f"${company_info.get('currentPrice', 0):.2f}",
-            f"${company_info.get('previousClose', 0):.2f}",
-            f"${company_info.get('dayHigh', 0):.2f}",
-            f"${company_info.get('dayLow', 0):.2f}",
-            f"{company_info.get('volume', 0):,}",
-            f"${company_info.get('marketCap', 0)/1e9:.2f}B"
-            if company_info.get('marketCap', 0) > 0 else "N/A",
-            f"{company_info.get('trailingPE', 0):.2f}"
-            if company_info.get('trailingPE') else "N/A",
-            f"${company_info.get('trailingEps', 0):.2f}"
-            if company_info.get('trailingEps') else "N/A",
-            f"{company_info.get('dividendYield', 0)*100:.2f}%"
-            if company_info.get('dividendYield') else "N/A",
-            f"{company_info.get('beta', 0):.2f}"
-            if company_info.get('beta') else "N/A"
-        ]
-    }
-
-    financial_df = pd.DataFrame(financial_data)
+    # Prepare financial data rows once; they feed both the table and the CSV
+    financial_rows = build_financial_rows(company_info)
+
+    # Arrow-backed strings go to st.dataframe's Arrow serialization as-is
+    financial_df = pd.DataFrame(financial_rows,
+                                columns=FINANCIAL_COLUMNS,
+                                dtype='string[pyarrow]')
     st.dataframe(financial_df, use_container_width=True, hide_index=True)
 
     # Download Section
@@ -364,46 +373,104 @@ def display_analysis_results(stock_data, ai_analysis):
     col1, col2 = st.columns(2)
 
     with col1:
-        # Download financial data
-        csv_financial = financial_df.to_csv(index=False)
+        # Download financial data; the CSV is only built when the button is clicked
         st.download_button(
             label="📊 Download Financial Data (CSV)",
-            data=csv_financial,
+            data=lambda: rows_to_csv(FINANCIAL_COLUMNS, financial_rows),
             file_name=
             f"{company_info.get('symbol', 'stock')}_financial_data.csv",
             mime="text/csv")
 
     with col2:
-        # Download AI analysis
-        ai_analysis_df = pd.DataFrame([{
-            'Company':
-            company_info.get('longName', 'Unknown'),
-            'Symbol':
-            company_info.get('symbol', 'N/A'),
-            'AI Investment Recommendation':
-            rec_action,
-            'AI Score':
-            recommendation.get('ai_score', 0),
-            'AI Revenue Exposure %':
-            ai_metrics.get('ai_revenue_exposure', 0),
-            'AI Partnerships':
-            ai_metrics.get('ai_partnerships', 0),
-            'AI Patents':
-            ai_metrics.get('ai_patents', 0),
-            'AI Investment Score':
-            ai_metrics.get('ai_investment_score', 0),
-            'Analysis Date':
-            datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }])
-
-        csv_ai = ai_analysis_df.to_csv(index=False)
+        # Download AI analysis; the CSV is only built when the button is clicked
+        def build_ai_csv():
+            return rows_to_csv(
+                ['Company', 'Symbol', 'AI Investment Recommendation',
+                 'AI Score', 'AI Revenue Exposure %', 'AI Partnerships',
+                 'AI Patents', 'AI Investment Score', 'Analysis Date'],
+                [[company_info.get('longName', 'Unknown'),
+                  company_info.get('symbol', 'N/A'), rec_action,
+                  recommendation.get('ai_score', 0),
+                  ai_metrics.get('ai_revenue_exposure', 0),
+                  ai_metrics.get('ai_partnerships', 0),
+                  ai_metrics.get('ai_patents', 0),
+                  ai_metrics.get('ai_investment_score', 0),
+                  datetime.now().strftime('%Y-%m-%d %H:%M:%S')]])
+
         st.download_button(
             label="🤖 Download AI Analysis (CSV)",
-            data=csv_ai,
+            data=build_ai_csv,
             file_name=f"{company_info.get('symbol', 'stock')}_ai_analysis.csv",
             mime="text/csv")
 
 
+def build_financial_rows(company_info):
+    """Build the (metric, value) rows for the key financial data table"""
+    return [
+        ('Current Price', f"${company_info.get('currentPrice', 0):.2f}"),
+        ('Previous Close', f"${company_info.get('previousClose', 0):.2f}"),
+        ('Day High', f"${company_info.get('dayHigh', 0):.2f}"),
+        ('Day Low', f"${company_info.get('dayLow', 0):.2f}"),
+        ('Volume', f"{company_info.get('volume', 0):,}"),
+        ('Market Cap', f"${company_info.get('marketCap', 0)/1e9:.2f}B"
+         if company_info.get('marketCap', 0) > 0 else "N/A"),
+        ('P/E Ratio', f"{company_info.get('trailingPE', 0):.2f}"
+         if company_info.get('trailingPE') else "N/A"),
+        ('EPS', f"${company_info.get('trailingEps', 0):.2f}"
+         if company_info.get('trailingEps') else "N/A"),
+        ('Dividend Yield', f"{company_info.get('dividendYield', 0)*100:.2f}%"
+         if company_info.get('dividendYield') else "N/A"),
+        ('Beta', f"{company_info.get('beta', 0):.2f}"
+         if company_info.get('beta') else "N/A"),
+    ]
+
+
+def rows_to_csv(header, rows):
+    """Serialize a header and rows to CSV text"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(header)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+def _bullets(items, empty_msg):
+    """Render a list as a single markdown bullet list, or empty_msg if it is empty"""
+    if items:
+        st.markdown("\n".join(f"- {item}" for item in items))
+    else:
+        st.write(empty_msg)
+
+
+def _price_data_key(price_data):
+    """Cheap cache key for a price history: its date range, length and latest close"""
+    return (price_data.index[0], price_data.index[-1], len(price_data),
+            price_data['Close'].iloc[-1])
+
+
+@st.cache_data(show_spinner=False,
+               hash_funcs={pd.DataFrame: _price_data_key})
+def build_price_chart(symbol, price_data):
+    """Build the closing price chart, cached so reruns skip rebuilding the figure"""
+    fig = go.Figure()
+
+    fig.add_trace(
+        go.Scattergl(x=price_data.index,
+                     y=price_data['Close'].to_numpy(),
+                     mode='lines',
+                     name='Close Price',
+                     line=dict(color='#1f77b4', width=2)))
+
+    fig.update_layout(title=f"{symbol} Price Chart",
+                      xaxis_title="Date",
+                      yaxis_title="Price ($)",
+                      yaxis_hoverformat='.2f',
+                      hovermode='x unified',
+                      showlegend=True)
+
+    return fig
+
+
 def display_401k_results(company_name, analysis):
     """Display comprehensive 401K analysis results"""
 
@@ -450,13 +517,12 @@ def display_401k_results(company_name, analysis):
         color = 'red'
         status = 'Needs Improvement'
 
-    st.markdown(f"""
-    <div style="padding: 1rem; border-left: 5px solid {color}; background-color: rgba(128,128,128,0.1);">
-    <h4 style="color: {color}; margin: 0;">401K Status: {status}</h4>
-    <p style="margin: 0.5rem 0;"><strong>Optimization Score:</strong> {rec_score}/10</p>
-    <p style="margin: 0;"><strong>Key Recommendation:</strong> {recommendation.get('primary_advice', 'No recommendation available')}</p>
-    </div>
-    """,
+    st.markdown(K401_STATUS_HTML.format(
+        color=color,
+        status=status,
+        score=rec_score,
+        advice=recommendation.get('primary_advice',
+                                  'No recommendation available')),
                 unsafe_allow_html=True)
 
     # Detailed Analysis
@@ -467,12 +533,8 @@ def display_401k_results(company_name, analysis):
         strategy = analysis.get('contribution_strategy', {})
 
         st.markdown("**Recommended Actions:**")
-        actions = strategy.get('recommended_actions', [])
-        if actions:
-            for action in actions:
-                st.write(f"• {action}")
-        else:
-            st.write("No specific actions identified.")
+        _bullets(strategy.get('recommended_actions', []),
+                 "No specific actions identified.")
 
         st.markdown("**Annual Savings Potential:**")
         savings_potential = strategy.get('annual_savings_potential',
@@ -499,21 +561,13 @@ def display_401k_results(company_name, analysis):
 
     with col1:
         st.markdown("**Recommended Funds:**")
-        recommended = fund_options.get('recommended_funds', [])
-        if recommended:
-            for fund in recommended:
-                st.write(f"• {fund}")
-        else:
-            st.write("No specific fund recommendations available.")
+        _bullets(fund_options.get('recommended_funds', []),
+                 "No specific fund recommendations available.")
 
     with col2:
         st.markdown("**Fund Categories Available:**")
-        categories = fund_options.get('fund_categories', [])
-        if categories:
-            for category in categories:
-                st.write(f"• {category}")
-        else:
-            st.write("Fund information not available.")
+        _bullets(fund_options.get('fund_categories', []),
+                 "Fund information not available.")
 
     # Additional Benefits
     st.markdown("### ➕ Additional Benefits")
@@ -523,48 +577,37 @@ def display_401k_results(company_name, analysis):
 
     with col1:
         st.markdown("**Other Retirement Benefits:**")
-        other_benefits = additional.get('other_benefits', [])
-        if other_benefits:
-            for benefit in other_benefits:
-                st.write(f"• {benefit}")
-        else:
-            st.write("No additional benefits identified.")
+        _bullets(additional.get('other_benefits', []),
+                 "No additional benefits identified.")
 
     with col2:
         st.markdown("**Company Perks:**")
-        perks = additional.get('financial_wellness_perks', [])
-        if perks:
-            for perk in perks:
-                st.write(f"• {perk}")
-        else:
-            st.write("No financial wellness perks identified.")
+        _bullets(additional.get('financial_wellness_perks', []),
+                 "No financial wellness perks identified.")
 
     # Download Section
     st.markdown("### 💾 Download 401K Analysis")
 
-    # Create downloadable report
-    report_data = {
-        'Company': [company_name],
-        'Match Percentage': [overview.get('match_percentage', 0)],
-        'Vesting Period': [overview.get('vesting_period', 'Unknown')],
-        'Roth Available': [overview.get('roth_available', False)],
-        'Max Match Salary %': [overview.get('max_match_salary_percent', 0)],
-        'Optimization Score': [rec_score],
-        'Primary Recommendation':
-        [recommendation.get('primary_advice', 'No recommendation')],
-        'Roth vs Traditional':
-        [roth_analysis.get('recommendation', 'Traditional')],
-        'Annual Savings Potential':
-        [strategy.get('annual_savings_potential', 'Not calculated')],
-        'Analysis Date': [datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
-    }
-
-    report_df = pd.DataFrame(report_data)
-    csv_report = report_df.to_csv(index=False)
+    # Create downloadable report; the CSV is only built when the button is clicked
+    def build_report_csv():
+        return rows_to_csv(
+            ['Company', 'Match Percentage', 'Vesting Period', 'Roth Available',
+             'Max Match Salary %', 'Optimization Score',
+             'Primary Recommendation', 'Roth vs Traditional',
+             'Annual Savings Potential', 'Analysis Date'],
+            [[company_name,
+              overview.get('match_percentage', 0),
+              overview.get('vesting_period', 'Unknown'),
+              overview.get('roth_available', False),
+              overview.get('max_match_salary_percent', 0), rec_score,
+              recommendation.get('primary_advice', 'No recommendation'),
+              roth_analysis.get('recommendation', 'Traditional'),
+              strategy.get('annual_savings_potential', 'Not calculated'),
+              datetime.now().strftime('%Y-%m-%d %H:%M:%S')]])
 
     st.download_button(
         label="📊 Download 401K Analysis Report (CSV)",
-        data=csv_report,
+        data=build_report_csv,
         file_name=f"{company_name.replace(' ', '_')}_401k_analysis.csv",
         mime="text/csv")
 
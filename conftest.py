@@ -0,0 +1 @@
+# Lets the tests import the top-level app modules (stock_data, ai_analysis, app)
@@ -1,7 +1,191 @@
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import streamlit as st
 import yfinance as yf
 import pandas as pd
 from datetime import datetime, timedelta
 
+try:
+    import bottleneck as bn
+except ImportError:
+    bn = None
+
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        """Fallback when numba is not installed: run the function as plain Python"""
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# How long fetched Yahoo Finance data is reused across Streamlit reruns
+STOCK_DATA_TTL_SECONDS = 15 * 60
+
+# Rows needed for the latest indicator values: SMA-50 plus RSI-14 warm-up
+INDICATOR_TAIL_ROWS = 80
+
+
+@functools.lru_cache(maxsize=128)
+def _ticker_for_window(symbol, window):
+    """yf.Ticker for a symbol, one instance per cache window"""
+    return yf.Ticker(symbol)
+
+
+def _ticker(symbol):
+    """
+    Shared yf.Ticker for a symbol
+    
+    yfinance memoizes info and financials on the Ticker itself, so instances are
+    rotated every STOCK_DATA_TTL_SECONDS to keep them from going stale.
+    """
+    return _ticker_for_window(symbol, int(time.time() // STOCK_DATA_TTL_SECONDS))
+
+
+@st.cache_data(ttl=STOCK_DATA_TTL_SECONDS, show_spinner=False)
+def _info(symbol):
+    """Company info dict for a symbol, cached; errors raise so they are not cached"""
+    info = _ticker(symbol).info
+    if not info or 'symbol' not in info:
+        raise ValueError(f"No company info for {symbol}")
+    return info
+
+
+@st.cache_data(ttl=STOCK_DATA_TTL_SECONDS, show_spinner=False)
+def _fetch_stock(symbol, period):
+    """
+    Fetch stock info and financials from Yahoo Finance, cached per (symbol, period)
+    
+    Errors are raised rather than returned so that failed fetches are not cached.
+    """
+    # Shared ticker object
+    ticker = _ticker(symbol)
+    
+    # Each endpoint is a separate blocking HTTPS request, so issue them concurrently
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = {
+            'price_data': executor.submit(
+                lambda: ticker.history(period=period, actions=False, auto_adjust=False)),
+            'quarterly_financials': executor.submit(lambda: ticker.quarterly_financials),
+            'balance_sheet': executor.submit(lambda: ticker.balance_sheet),
+            'cash_flow': executor.submit(lambda: ticker.cashflow)
+        }
+        
+        # Info comes from the same cache as validate_symbol and the name lookups;
+        # it raises when the symbol has no company data
+        info = _info(symbol)
+    
+    # yfinance returns an empty frame on network errors as well as unknown
+    # symbols, so raise to keep either from being cached
+    hist_data = futures['price_data'].result()
+    if hist_data.empty:
+        raise ValueError(f"No price history for {symbol}")
+    
+    # Only Close and Volume are used downstream; float32 halves the cached frame
+    hist_data = hist_data[['Close', 'Volume']].astype(np.float32)
+    
+    # If financial data is not available, continue without it
+    financials = {}
+    for key in ('quarterly_financials', 'balance_sheet', 'cash_flow'):
+        try:
+            financials[key] = futures[key].result()
+        except Exception:
+            financials[key] = pd.DataFrame()
+    
+    return {
+        'info': info,
+        'price_data': hist_data,
+        **financials
+    }
+
+
+@st.cache_data(ttl=STOCK_DATA_TTL_SECONDS, show_spinner=False)
+def _download_many(symbols, period):
+    """
+    Fetch price history for several symbols in one yf.download batch, cached per
+    (symbols, period); symbols must be a sorted tuple so equal sets share an entry
+    """
+    data = yf.download(list(symbols),
+                       period=period,
+                       group_by='ticker',
+                       threads=True,
+                       actions=False,
+                       auto_adjust=False,
+                       progress=False)
+    
+    # Symbols that failed to download come back as all-NaN columns
+    histories = {}
+    for symbol in symbols:
+        if symbol not in data.columns.get_level_values(0):
+            continue
+        hist_data = data[symbol].dropna(how='all')
+        if not hist_data.empty:
+            histories[symbol] = hist_data[['Close', 'Volume']].astype(np.float32)
+    return histories
+
+
+def _moving_mean(values, window):
+    """Trailing moving average of a float64 array, NaN until window values are available"""
+    if values.shape[0] < window:
+        return np.full(values.shape[0], np.nan)
+    if bn is not None:
+        return bn.move_mean(values, window=window, min_count=window)
+    
+    # Without bottleneck, use a cumulative-sum sliding window
+    result = np.full(values.shape[0], np.nan)
+    cumsum = np.cumsum(np.insert(values, 0, 0.0))
+    result[window - 1:] = (cumsum[window:] - cumsum[:-window]) / window
+    return result
+
+
+@njit(cache=True)
+def _rsi_wilder(close, n=14):
+    """
+    Relative Strength Index with Wilder's smoothing in a single pass
+    
+    Args:
+        close (np.ndarray): float64 closing prices without NaN gaps; a NaN would
+            propagate through the smoothing into every later value
+        n (int): RSI period
+        
+    Returns:
+        np.ndarray: RSI values, NaN for the first n entries
+    """
+    rsi = np.full(close.shape[0], np.nan)
+    if close.shape[0] <= n:
+        return rsi
+    
+    # Seed the averages with the simple mean of the first n changes
+    avg_gain = 0.0
+    avg_loss = 0.0
+    for i in range(1, n + 1):
+        change = close[i] - close[i - 1]
+        if change > 0:
+            avg_gain += change
+        else:
+            avg_loss -= change
+    avg_gain /= n
+    avg_loss /= n
+    rsi[n] = 100.0 if avg_loss == 0.0 else 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    
+    for i in range(n + 1, close.shape[0]):
+        change = close[i] - close[i - 1]
+        gain = change if change > 0 else 0.0
+        loss = -change if change < 0 else 0.0
+        avg_gain = (avg_gain * (n - 1) + gain) / n
+        avg_loss = (avg_loss * (n - 1) + loss) / n
+        rsi[i] = 100.0 if avg_loss == 0.0 else 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    
+    return rsi
+
+
+# Compile at import so the first analysis doesn't pay the JIT cost
+_rsi_wilder(np.arange(16, dtype=np.float64))
+
+
 class StockDataFetcher:
     """Class to fetch and process stock data from Yahoo Finance"""
     
@@ -20,50 +204,29 @@ class StockDataFetcher:
             dict: Dictionary containing stock info and price data
         """
         try:
-            # Create ticker object
-            ticker = yf.Ticker(symbol)
-            
-            # Get basic company info
-            info = ticker.info
-            
-            # Validate that we have valid company data
-            if not info or 'symbol' not in info:
-                return None
-            
-            # Get historical price data
-            hist_data = ticker.history(period=period)
-            
-            if hist_data.empty:
-                return None
-            
-            # Get additional financial data
-            try:
-                # Get quarterly financials
-                quarterly_financials = ticker.quarterly_financials
-                
-                # Get balance sheet
-                balance_sheet = ticker.balance_sheet
-                
-                # Get cash flow
-                cash_flow = ticker.cashflow
-            except:
-                # If financial data is not available, continue without it
-                quarterly_financials = pd.DataFrame()
-                balance_sheet = pd.DataFrame()
-                cash_flow = pd.DataFrame()
-            
-            return {
-                'info': info,
-                'price_data': hist_data,
-                'quarterly_financials': quarterly_financials,
-                'balance_sheet': balance_sheet,
-                'cash_flow': cash_flow
-            }
-            
+            return _fetch_stock(symbol, period)
         except Exception as e:
             print(f"Error fetching stock data for {symbol}: {str(e)}")
             return None
     
+    def get_many(self, symbols, period="1y"):
+        """
+        Fetch price history for several symbols in a single batched download
+        
+        Args:
+            symbols (list): Stock ticker symbols
+            period (str): Time period for historical data
+            
+        Returns:
+            dict: Close and Volume history per uppercased symbol; symbols without data are omitted
+        """
+        try:
+            # yfinance keys its columns by the uppercased ticker
+            return _download_many(tuple(sorted({symbol.strip().upper() for symbol in symbols})), period)
+        except Exception as e:
+            print(f"Error fetching stock data for {', '.join(symbols)}: {str(e)}")
+            return {}
+    
     def validate_symbol(self, symbol):
         """
         Validate if a stock symbol exists and has data
@@ -75,11 +238,9 @@ class StockDataFetcher:
             bool: True if valid, False otherwise
         """
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
-            
-            # Check if we have basic company information
-            return bool(info and 'symbol' in info and info.get('longName'))
+            # fast_info is a lightweight quote request; the full .info is only
+            # fetched when the company details are actually needed
+            return _ticker(symbol).fast_info.last_price is not None
             
         except:
             return False
@@ -95,8 +256,7 @@ class StockDataFetcher:
             str: Company name or None if not found
         """
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
+            info = _info(symbol)
             return info.get('longName')
         except:
             return None
@@ -112,18 +272,19 @@ class StockDataFetcher:
             tuple: (sector, industry) or (None, None) if not found
         """
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
+            info = _info(symbol)
             return info.get('sector'), info.get('industry')
         except:
             return None, None
     
-    def calculate_technical_indicators(self, price_data):
+    def calculate_technical_indicators(self, price_data, tail_only=True):
         """
         Calculate basic technical indicators
         
         Args:
-            price_data (pd.DataFrame): Historical price data
+            price_data (pd.DataFrame): Historical Close and Volume data
+            tail_only (bool): Compute over the last INDICATOR_TAIL_ROWS rows only; RSI then
+                smooths over ~65 steps instead of the full history, a negligible difference
             
         Returns:
             dict: Dictionary with technical indicators
@@ -132,30 +293,35 @@ class StockDataFetcher:
             return {}
         
         try:
+            close = price_data['Close'].to_numpy(dtype=np.float64)
+            volume = price_data['Volume'].to_numpy(dtype=np.float64)
+            
+            # yfinance histories can contain gaps; drop them so they don't poison the RSI
+            close = close[~np.isnan(close)]
+            if tail_only:
+                # Only the latest values are reported, so skip the older history
+                close = close[-INDICATOR_TAIL_ROWS:]
+            
             # Calculate moving averages
-            sma_20 = price_data['Close'].rolling(window=20).mean()
-            sma_50 = price_data['Close'].rolling(window=50).mean()
+            sma_20 = _moving_mean(close, 20)
+            sma_50 = _moving_mean(close, 50)
             
-            # Calculate RSI (simplified)
-            delta = price_data['Close'].diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-            rs = gain / loss
-            rsi = 100 - (100 / (1 + rs))
+            # Calculate RSI (Wilder's smoothing)
+            rsi = _rsi_wilder(close)
             
             # Current values
-            current_price = price_data['Close'].iloc[-1]
-            current_sma_20 = sma_20.iloc[-1] if not sma_20.empty else None
-            current_sma_50 = sma_50.iloc[-1] if not sma_50.empty else None
-            current_rsi = rsi.iloc[-1] if not rsi.empty else None
+            current_price = close[-1]
+            current_sma_20 = sma_20[-1] if close.size >= 20 else None
+            current_sma_50 = sma_50[-1] if close.size >= 50 else None
+            current_rsi = rsi[-1] if rsi.size else None
             
             return {
                 'current_price': current_price,
                 'sma_20': current_sma_20,
                 'sma_50': current_sma_50,
                 'rsi': current_rsi,
-                'volume_avg': price_data['Volume'].tail(20).mean(),
-                'price_change_30d': ((current_price - price_data['Close'].iloc[-30]) / price_data['Close'].iloc[-30] * 100) if len(price_data) >= 30 else None
+                'volume_avg': np.nanmean(volume[-20:]),
+                'price_change_30d': ((current_price - close[-30]) / close[-30] * 100) if close.size >= 30 else None
             }
             
         except Exception as e:
@@ -0,0 +1,180 @@
+import unicodedata
+from collections import OrderedDict
+
+import pytest
+
+import ai_analysis
+from ai_analysis import AIAnalyzer, CombinedAnalysis, AIStrategy, sanitize_text
+
+
+def _sanitize_text_loop(s):
+    """The original replace-loop implementation of sanitize_text"""
+    if not s:
+        return ""
+    s = unicodedata.normalize('NFKC', str(s))
+    replacements = {
+        '\u2014': '-',
+        '\u2013': '-',
+        '\u2018': "'",
+        '\u2019': "'",
+        '\u201C': '"',
+        '\u201D': '"',
+        '\u2026': '...',
+        '\u00A0': ' ',
+    }
+    for unicode_char, ascii_char in replacements.items():
+        s = s.replace(unicode_char, ascii_char)
+    return s.encode('ascii', 'backslashreplace').decode('ascii')
+
+
+COMBINED = {
+    'ai_strategy': {
+        'ai_initiatives': ['Copilot', 'Azure OpenAI'],
+        'competitive_advantages': ['Distribution'],
+        'revenue_streams': ['Cloud'],
+        'partnerships': ['OpenAI'],
+        'opportunities': ['Agents'],
+        'risks': ['Capex'],
+        'ai_maturity_score': 9,
+        'overall_assessment': 'Leader'
+    },
+    'investment_recommendation': {
+        'action': 'BUY',
+        'ai_score': 9,
+        'reasoning': 'Strong AI positioning',
+        'key_catalysts': ['Copilot adoption'],
+        'risk_factors': ['Regulation']
+    },
+    'ai_story': {
+        'strategy_summary': 'AI across the stack',
+        'use_cases': ['Coding assistants'],
+        'opportunities': ['Enterprise agents'],
+        'competitive_advantages': ['Ecosystem']
+    }
+}
+
+
+@pytest.fixture
+def analyzer(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(ai_analysis, "_memory_cache", OrderedDict())
+    analyzer = AIAnalyzer()
+    # Exercise the in-process cache even when diskcache is installed
+    analyzer._cache = None
+    return analyzer
+
+
+@pytest.fixture
+def company_context(analyzer):
+    return analyzer._prepare_company_context("MSFT", {
+        'longName': 'Microsoft Corporation',
+        'sector': 'Technology',
+        'industry': 'Software',
+        'longBusinessSummary': 'Cloud and software.',
+        'marketCap': 3e12,
+        'fullTimeEmployees': 220000
+    })
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    None,
+    42,
+    "Plain ASCII text",
+    "Microsoft\u2019s \u201cCopilot\u201d \u2014 AI\u2026",
+    "Caf\u00e9 costs \u20ac5\u00a0\u2013 \ufb01ne",
+    "Emoji \U0001F680 and full-width \uff21\uff29",
+])
+def test_sanitize_text_matches_replace_loop(text):
+    assert sanitize_text(text) == _sanitize_text_loop(text)
+
+
+def test_combined_response_validates_against_schema():
+    assert CombinedAnalysis.model_validate(COMBINED).model_dump() == COMBINED
+
+
+def test_assemble_analysis_splits_combined_response(analyzer, company_context, monkeypatch):
+    def fail(*args):
+        raise AssertionError("per-task fallback called for a complete combined response")
+    
+    for name in ('_analyze_ai_strategy', '_get_investment_recommendation', '_generate_ai_story'):
+        monkeypatch.setattr(analyzer, name, fail)
+    
+    result = analyzer._assemble_analysis(company_context, COMBINED)
+    
+    assert result['investment_recommendation'] == COMBINED['investment_recommendation']
+    assert result['ai_story'] == COMBINED['ai_story']
+    assert result['ai_metrics'] == analyzer._calculate_ai_metrics(company_context, COMBINED['ai_strategy'])
+    assert result['is_fallback'] is False
+
+
+def test_assemble_analysis_only_requests_missing_sections(analyzer, company_context, monkeypatch):
+    story = {'strategy_summary': 'Fallback story', 'use_cases': [], 'opportunities': [],
+             'competitive_advantages': []}
+    calls = []
+    
+    def generate_ai_story(context, strategy):
+        calls.append(strategy)
+        return story
+    
+    monkeypatch.setattr(analyzer, '_generate_ai_story', generate_ai_story)
+    combined = {key: value for key, value in COMBINED.items() if key != 'ai_story'}
+    
+    result = analyzer._assemble_analysis(company_context, combined)
+    
+    assert calls == [COMBINED['ai_strategy']]
+    assert result['ai_story'] == story
+    assert result['investment_recommendation'] == COMBINED['investment_recommendation']
+
+
+def test_assemble_analysis_flags_placeholder_sections(analyzer, company_context, monkeypatch):
+    def broken_chat(*args, **kwargs):
+        raise RuntimeError("OpenAI unavailable")
+    
+    monkeypatch.setattr(analyzer, '_cached_chat', broken_chat)
+    
+    assert analyzer._assemble_analysis(company_context, {})['is_fallback'] is True
+
+
+def test_cache_key_is_stable_and_input_sensitive(analyzer, company_context):
+    messages = analyzer._build_messages(ai_analysis.ANALYST_SYSTEM_PROMPT, company_context, "Task")
+    key = analyzer._cache_key(messages, CombinedAnalysis, max_completion_tokens=100)
+    
+    assert key == analyzer._cache_key(list(messages), CombinedAnalysis, max_completion_tokens=100)
+    assert key != analyzer._cache_key(messages, CombinedAnalysis, max_completion_tokens=200)
+    assert key != analyzer._cache_key(messages, AIStrategy, max_completion_tokens=100)
+    other = analyzer._build_messages(ai_analysis.ANALYST_SYSTEM_PROMPT, company_context, "Other")
+    assert key != analyzer._cache_key(other, CombinedAnalysis, max_completion_tokens=100)
+
+
+def test_memory_cache_evicts_least_recently_used(analyzer, monkeypatch):
+    monkeypatch.setattr(ai_analysis, "MEMORY_CACHE_MAX_ENTRIES", 2)
+    
+    analyzer._cache_set('a', {'value': 1})
+    analyzer._cache_set('b', {'value': 2})
+    assert analyzer._cache_get('a') == {'value': 1}
+    analyzer._cache_set('c', {'value': 3})
+    
+    assert analyzer._cache_get('b') is None
+    assert analyzer._cache_get('a') == {'value': 1}
+    assert analyzer._cache_get('c') == {'value': 3}
+
+
+def test_memory_cache_expires_entries(analyzer, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ai_analysis.time, "time", lambda: now[0])
+    
+    analyzer._cache_set('a', {'value': 1})
+    now[0] += ai_analysis.CACHE_TTL_SECONDS - 1
+    assert analyzer._cache_get('a') == {'value': 1}
+    now[0] += 2
+    
+    assert analyzer._cache_get('a') is None
+    assert 'a' not in ai_analysis._memory_cache
+
+
+def test_memory_cache_returns_copies(analyzer):
+    analyzer._cache_set('a', {'items': [1]})
+    analyzer._cache_get('a')['items'].append(2)
+    
+    assert analyzer._cache_get('a') == {'items': [1]}
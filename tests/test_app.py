@@ -0,0 +1,25 @@
+import csv
+import io
+
+from app import build_financial_rows, rows_to_csv
+
+
+def test_rows_to_csv_quotes_commas_and_quotes():
+    text = rows_to_csv(['Metric', 'Value'], [('Volume', '1,234,567'),
+                                             ('Note', 'say "hi"')])
+    
+    assert text == 'Metric,Value\nVolume,"1,234,567"\nNote,"say ""hi"""\n'
+    assert list(csv.reader(io.StringIO(text))) == [
+        ['Metric', 'Value'], ['Volume', '1,234,567'], ['Note', 'say "hi"']
+    ]
+
+
+def test_financial_rows_round_trip_through_csv():
+    rows = build_financial_rows({'currentPrice': 101.5, 'volume': 1234567,
+                                 'marketCap': 2.5e12, 'trailingPE': 30.25})
+    
+    parsed = list(csv.reader(io.StringIO(rows_to_csv(['Metric', 'Value'], rows))))
+    
+    assert parsed[0] == ['Metric', 'Value']
+    assert [tuple(row) for row in parsed[1:]] == rows
+    assert ('Volume', '1,234,567') in rows
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import stock_data
+from stock_data import StockDataFetcher, _moving_mean, _rsi_wilder
+
+
+def _close_series(n=120, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.Series(100 + np.cumsum(rng.normal(0, 1, n)))
+
+
+def _wilder_rsi_pandas(close, n=14):
+    """Reference Wilder RSI: seed with the first-n mean, then ewm(alpha=1/n)"""
+    delta = close.diff()
+    gain = delta.clip(lower=0)
+    loss = -delta.clip(upper=0)
+    
+    avg = {}
+    for name, series in (('gain', gain), ('loss', loss)):
+        seeded = series.iloc[n:].copy()
+        seeded.iloc[0] = series.iloc[1:n + 1].mean()
+        avg[name] = seeded.ewm(alpha=1 / n, adjust=False).mean()
+    
+    rsi = 100 - 100 / (1 + avg['gain'] / avg['loss'])
+    return rsi.reindex(close.index)
+
+
+@pytest.mark.parametrize("window", [20, 50])
+def test_moving_mean_matches_pandas_rolling(window):
+    close = _close_series()
+    expected = close.rolling(window=window).mean().to_numpy()
+    np.testing.assert_allclose(_moving_mean(close.to_numpy(), window), expected)
+
+
+@pytest.mark.parametrize("window", [20, 50])
+def test_moving_mean_cumsum_fallback_matches_pandas_rolling(monkeypatch, window):
+    monkeypatch.setattr(stock_data, "bn", None)
+    close = _close_series()
+    expected = close.rolling(window=window).mean().to_numpy()
+    np.testing.assert_allclose(_moving_mean(close.to_numpy(), window), expected)
+
+
+def test_moving_mean_short_history_is_nan():
+    assert np.isnan(_moving_mean(np.arange(10, dtype=np.float64), 20)).all()
+
+
+@pytest.mark.parametrize("kernel", [_rsi_wilder, getattr(_rsi_wilder, "py_func", _rsi_wilder)])
+def test_rsi_wilder_matches_pandas_reference(kernel):
+    close = _close_series()
+    np.testing.assert_allclose(kernel(close.to_numpy()), _wilder_rsi_pandas(close).to_numpy())
+
+
+def test_rsi_wilder_short_history_is_nan():
+    assert np.isnan(_rsi_wilder(np.arange(10, dtype=np.float64))).all()
+
+
+def _price_data(close):
+    index = pd.date_range("2025-01-01", periods=len(close), freq="B")
+    volume = np.full(len(close), 1e6)
+    return pd.DataFrame({"Close": close, "Volume": volume}, index=index).astype(np.float32)
+
+
+@pytest.mark.parametrize("tail_only", [True, False])
+def test_indicators_match_old_pandas_code(tail_only):
+    price_data = _price_data(_close_series(250).to_numpy())
+    close = price_data['Close']
+    
+    result = StockDataFetcher().calculate_technical_indicators(price_data, tail_only=tail_only)
+    
+    assert result['current_price'] == pytest.approx(close.iloc[-1])
+    assert result['sma_20'] == pytest.approx(close.rolling(window=20).mean().iloc[-1], rel=1e-6)
+    assert result['sma_50'] == pytest.approx(close.rolling(window=50).mean().iloc[-1], rel=1e-6)
+    assert result['volume_avg'] == pytest.approx(price_data['Volume'].tail(20).mean())
+    expected_change = (close.iloc[-1] - close.iloc[-30]) / close.iloc[-30] * 100
+    assert result['price_change_30d'] == pytest.approx(expected_change, rel=1e-5)
+
+
+def test_indicators_skip_nan_gaps():
+    close = _close_series(250).to_numpy()
+    gapped = close.copy()
+    gapped[200] = np.nan
+    fetcher = StockDataFetcher()
+    
+    result = fetcher.calculate_technical_indicators(_price_data(gapped))
+    expected = fetcher.calculate_technical_indicators(_price_data(np.delete(close, 200)))
+    
+    assert np.isfinite(result['rsi'])
+    assert result['rsi'] == pytest.approx(expected['rsi'])
+    assert result['sma_20'] == pytest.approx(expected['sma_20'])
+
+
+def test_get_many_uppercases_symbols(monkeypatch):
+    calls = []
+    
+    def fake_download(tickers, **kwargs):
+        calls.append(tickers)
+        index = pd.date_range("2025-01-01", periods=5, freq="B")
+        columns = pd.MultiIndex.from_product([tickers, ['Close', 'Volume']])
+        return pd.DataFrame(1.0, index=index, columns=columns)
+    
+    monkeypatch.setattr(stock_data.yf, "download", fake_download)
+    stock_data._download_many.clear()
+    
+    histories = StockDataFetcher().get_many(['msft', ' aapl', 'AAPL'], period="1mo")
+    
+    assert calls == [['AAPL', 'MSFT']]
+    assert sorted(histories) == ['AAPL', 'MSFT']
+    assert list(histories['AAPL'].columns) == ['Close', 'Volume']